@@ -1,40 +1,166 @@
-import re
+import heapq
+import pickle
+import tempfile
+from array import array
+from operator import itemgetter
+
 import xlsxwriter
-from dataclasses import dataclass
 from codesys_symbols_parser import CodesysSymbolParser
-
-
-@dataclass
-class AlarmType:
-    pattern: str
-    offset: int
-
-
-alarm_types = [
-    AlarmType(r'Application\.S(\d+)\.stDefImdt\.', 1),
-    AlarmType(r'Application\.S(\d+)\.stDefFcy\.', 1000),
-    AlarmType(r'Application\.S(\d+)\.stDefAttente\.', 2000)
-]
-
-
-def get_alarm_list(symbols_list):
-    alarm_list = {}
+from symbol_sinks import SymbolSink, classify_symbol, write_symbols
+
+# Maximum number of alarms kept in memory before a sorted run is spilled to a temporary file
+DEFAULT_MEMORY_BUDGET = 100000
+# Maximum number of runs merged at once, bounding the number of temporary files open at the same time
+MAX_MERGE_RUNS = 16
+
+
+def station_key(station_id):
+    """Sort key of a station, ordering the stations by number"""
+    return int(station_id), station_id
+
+
+class AlarmAggregator:
+    """
+    Collect the station alarms while streaming the symbols and return them sorted by station and alarm ID.
+
+    Alarms are kept per station as compact arrays of alarm IDs and symbol references. Once memory_budget alarms are
+    buffered, they are sorted and spilled to a temporary file. Once MAX_MERGE_RUNS runs of the same level are spilled,
+    they are merged into a single run of the next level, and the remaining runs are merged back when reading rows().
+    Alarm IDs used by several symbols of the same station are detected during that merge. They are reported through
+    the on_collision callback of rows() as soon as found, and collected in collisions. validate() runs the merge
+    without returning the rows to get them before writing any row.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.alarm_count = 0
+        self.station_ids = set()
+        self.collisions = []  # (station, alarm ID, symbol names) of each alarm ID used more than once
+        self.skipped_symbols = []  # Names of the station alarms skipped as their alarm ID is unknown
+
+        self._alarms = {}  # station -> (alarm IDs, symbol references)
+        self._symbols = []  # (name, comment) of the buffered alarms, indexed by symbol reference
+        self._runs = []  # (merge level, temporary file) of the spilled sorted runs, oldest first
+
+    def add(self, station_id, alarm_id, symbol):
+        if station_id not in self._alarms:
+            self._alarms[station_id] = (array('q'), array('q'))
+            self.station_ids.add(station_id)
+        alarm_ids, symbol_refs = self._alarms[station_id]
+        alarm_ids.append(alarm_id)
+        symbol_refs.append(len(self._symbols))
+        self._symbols.append((symbol['name'], symbol['comment']))
+        self.alarm_count += 1
+
+        if len(self._symbols) >= self.memory_budget:
+            self._spill()
+
+    def _sorted_run(self):
+        """Yield the buffered alarms as (station key, alarm ID, station, name, comment) rows in sorted order"""
+        for station_id in sorted(self._alarms, key=station_key):
+            alarm_ids, symbol_refs = self._alarms[station_id]
+            # Sorting is stable so alarms sharing an ID keep their symbols order
+            for i in sorted(range(len(alarm_ids)), key=alarm_ids.__getitem__):
+                name, comment = self._symbols[symbol_refs[i]]
+                yield station_key(station_id), alarm_ids[i], station_id, name, comment
+
+    @staticmethod
+    def _write_run(rows):
+        run = tempfile.TemporaryFile()
+        # Rows are pickled one by one, a long-lived Pickler would keep every row in its memo
+        for row in rows:
+            pickle.dump(row, run)
+        return run
+
+    def _spill(self):
+        self._add_run(0, self._write_run(self._sorted_run()))
+
+        self._alarms = {}
+        self._symbols = []
+
+    def _add_run(self, level, run):
+        self._runs.append((level, run))
+        # Runs of lower levels are always merged before, so the runs of a level are the last ones of the list
+        last_runs = self._runs[-MAX_MERGE_RUNS:]
+        if len(last_runs) == MAX_MERGE_RUNS and all(run_level == level for run_level, _ in last_runs):
+            merged_runs = [run for _, run in last_runs]
+            del self._runs[-MAX_MERGE_RUNS:]
+            merged = self._write_run(heapq.merge(*(self._read_run(run) for run in merged_runs), key=itemgetter(0, 1)))
+            for run in merged_runs:
+                run.close()
+            self._add_run(level + 1, merged)
+
+    @staticmethod
+    def _read_run(run):
+        run.seek(0)
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+
+    def _add_collision(self, key, names, on_collision):
+        collision = (key[0][1], key[1], names)
+        self.collisions.append(collision)
+        if on_collision is not None:
+            on_collision(*collision)
+
+    def rows(self, on_collision=None):
+        """
+        Yield the alarms sorted by station number and alarm ID.
+        :param on_collision: Optional callable called with (station, alarm ID, symbol names) for each alarm ID used
+        more than once, as soon as the last alarm using it is read.
+        :return: A generator of (station, alarm ID, symbol name, comment) tuples.
+        """
+        self.collisions = []
+        runs = [self._read_run(run) for _, run in self._runs]
+        runs.append(self._sorted_run())
+
+        previous_key = None
+        names = []
+        for key, alarm_id, station_id, name, comment in heapq.merge(*runs, key=itemgetter(0, 1)):
+            if (key, alarm_id) != previous_key:
+                if len(names) > 1:
+                    self._add_collision(previous_key, names, on_collision)
+                previous_key = (key, alarm_id)
+                names = []
+            names.append(name)
+            yield station_id, alarm_id, name, comment
+        if len(names) > 1:
+            self._add_collision(previous_key, names, on_collision)
+
+    def validate(self, on_collision=None):
+        """
+        Merge the alarms without keeping the rows to find the alarm IDs used more than once.
+        :param on_collision: Optional callable, see rows().
+        :return: A list of (station, alarm ID, symbol names) tuples.
+        """
+        for _ in self.rows(on_collision):
+            pass
+        return self.collisions
+
+    def close(self):
+        for _, run in self._runs:
+            run.close()
+        self._runs = []
+
+
+def add_alarm(aggregator, symbol, symbol_class):
+    """Add the symbol to the aggregator if it is a station alarm"""
+    if symbol_class is None or symbol_class.station_id is None or symbol_class.category.alarm_offset is None:
+        return
+    # Node symbols have no byteoffset, and it is optional for the members of user types
+    if symbol.get('byteoffset') is None:
+        aggregator.skipped_symbols.append(symbol['name'])
+        return
+    aggregator.add(symbol_class.station_id, symbol_class.category.alarm_offset + symbol['byteoffset'], symbol)
+
+
+def get_alarm_list(symbols_list, memory_budget=DEFAULT_MEMORY_BUDGET):
+    aggregator = AlarmAggregator(memory_budget)
     for symbol in symbols_list:
-        for alarm_type in alarm_types:
-            res = re.search(alarm_type.pattern, symbol['name'])
-            if not res:
-                continue
-
-            symbol['alarm_offset'] = alarm_type.offset + symbol['byteoffset']
-
-            station_id = res.group(1)
-            if station_id in alarm_list:
-                alarm_list[station_id].append(symbol)
-            else:
-                alarm_list[station_id] = [symbol]
-
-            break
-    return alarm_list
+        add_alarm(aggregator, symbol, classify_symbol(symbol))
+    return aggregator
 
 
 def write_headers(worksheet):
@@ -49,23 +175,55 @@ def write_headers(worksheet):
 
 
 def write_alarms(worksheet, symbols_list):
+    aggregator = get_alarm_list(symbols_list)
+    try:
+        write_alarm_list(worksheet, aggregator)
+    finally:
+        aggregator.close()
+
+
+def print_collision(station_id, alarm_id, names):
+    print(f'Warning: alarm ID {alarm_id} of station {station_id} is used by {", ".join(names)}')
+
+
+def write_alarm_list(worksheet, aggregator):
     row_id = 1  # Starts writing at row 2
-    alarm_list = get_alarm_list(symbols_list)
-    print(f'{len(alarm_list)} alarms found.')
-    for station in alarm_list:
-        # Sort alarm list by alarm_offset
-        alarm_list[station].sort(key=lambda alarm: alarm['alarm_offset'])
-        for alarm in alarm_list[station]:
-            row_data = [station, alarm['alarm_offset'], alarm['name'], alarm['comment']]
-            worksheet.write_row(row_id, 0, row_data)
-            row_id += 1
+    print(f'{aggregator.alarm_count} alarms found in {len(aggregator.station_ids)} stations.')
+    for name in aggregator.skipped_symbols:
+        print(f'Warning: alarm {name} skipped as it has no byte offset')
+    for row_data in aggregator.rows(on_collision=print_collision):
+        worksheet.write_row(row_id, 0, row_data)
+        row_id += 1
+
+
+class AlarmIdSink(SymbolSink):
+    def __init__(self, fname, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.fname = fname
+        self.memory_budget = memory_budget
+
+        self._aggregator = None
+
+    def open(self):
+        self._aggregator = AlarmAggregator(self.memory_budget)
+
+    def write(self, symbol, symbol_class):
+        add_alarm(self._aggregator, symbol, symbol_class)
+
+    def close(self):
+        try:
+            with xlsxwriter.Workbook(self.fname) as workbook:
+                worksheet = workbook.add_worksheet()
+                write_headers(worksheet)
+                write_alarm_list(worksheet, self._aggregator)
+        finally:
+            self._aggregator.close()
+
+    def abort(self):
+        self._aggregator.close()
 
 
 def write_xls(fname, symbols_list):
-    with xlsxwriter.Workbook(fname) as workbook:
-        worksheet = workbook.add_worksheet()
-        write_headers(worksheet)
-        write_alarms(worksheet, symbols_list)
+    write_symbols(symbols_list, [AlarmIdSink(fname)])
 
 
 if __name__ == '__main__':
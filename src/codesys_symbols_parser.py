@@ -1,5 +1,8 @@
+import math
 import xml.etree.ElementTree as ET
 
+from type_store import TypeStore, hash_type_def
+
 
 def parse_comment(comment):
     if comment is None:
@@ -15,12 +18,24 @@ def parse_attribute(attribute_elmt):
 class CodesysSymbolParser:
     # namespace to use to parse the XML file
     __namespace = {'ns': 'http://www.3s-software.com/schemas/Symbolconfiguration.xsd'}
+    # Qualified tags used while traversing the nodes, finding them is faster than with prefixed paths
+    __node_tag = f"{{{__namespace['ns']}}}Node"
+    __comment_tag = f"{{{__namespace['ns']}}}Comment"
 
-    def __init__(self, symbols_file=''):
+    def __init__(self, symbols_file='', type_store=None, max_depth=None):
         self.symbols_file = symbols_file
+        # Pass the same store to several parsers to share the flattened type layouts between Applications
+        self.type_store = type_store if type_store is not None else TypeStore()
+        # Maximum nesting level of the Node hierarchy and of the user types, deeper levels are skipped. None for no limit
+        self.max_depth = max_depth
+        # Messages about the self-referencing types and the too deep nodes skipped while traversing
+        self.traversal_warnings = []
 
         # self._simple_type_defs = {}
         self._usertype_defs = []
+        self._usertype_hashes = {}
+        self._usertype_depths = {}
+        self._truncated_layouts = {}  # Layouts of the types with skipped members, indexed on type names
 
         self.root = None
 
@@ -32,6 +47,9 @@ class CodesysSymbolParser:
 
         # self._simple_type_defs = self._extract_simpletype_defs()
         self._usertype_defs = self._extract_usertype_defs()
+        self._usertype_hashes, self._usertype_depths = self._hash_usertype_defs()
+        self._truncated_layouts = {}
+        self.traversal_warnings = []
 
     def _extract_usertype_defs(self):
         """
@@ -94,60 +112,182 @@ class CodesysSymbolParser:
     #         }
     #     return types
 
+    def _hash_usertype_defs(self):
+        """
+        Compute the structural hash of each user type definition, including the structure of its member types, and
+        its nesting depth, which is the number of nested user type levels including itself.
+        Member types are hashed first using an explicit stack, a self-referencing member being hashed by its name and
+        ignored in the depth as it is skipped when flattening.
+        :return: Two dictionaries of hashes and depths indexed on type names keys.
+        """
+
+        hashes = {}
+        depths = {}
+        for root_type in self._usertype_defs:
+            if root_type in hashes:
+                continue
+            stack = [(root_type, iter(self._usertype_defs[root_type]))]
+            in_progress = {root_type}
+            while stack:
+                type_name, elements = stack[-1]
+                # Resume the scan of the members where it stopped before hashing the previous pending member
+                pending = next((element['type'] for element in elements
+                                if element['type'] in self._usertype_defs
+                                and element['type'] not in hashes
+                                and element['type'] not in in_progress), None)
+                if pending is not None:
+                    stack.append((pending, iter(self._usertype_defs[pending])))
+                    in_progress.add(pending)
+                    continue
+
+                elements = self._usertype_defs[type_name]
+                element_hashes = [hashes.get(element['type'], f"cycle:{element['type']}")
+                                  if element['type'] in self._usertype_defs else None
+                                  for element in elements]
+                hashes[type_name] = hash_type_def(elements, element_hashes)
+                depths[type_name] = 1 + max((depths[element['type']] for element in elements
+                                             if element['type'] in depths), default=0)
+                stack.pop()
+                in_progress.discard(type_name)
+        return hashes, depths
+
+    def _flatten_type(self, type_name):
+        """
+        Get each member of a specific type definition identified by its name, using an explicit stack of the nested
+        types. Member types already in the type store are reused and the flattened member types are added to it.
+        Self-referencing members and members nested deeper than max_depth are skipped.
+        :param type_name: Name of the type definition.
+        :return: A list of (path suffix, comment, byteoffset) tuples for the members of simple type and a flag
+        telling whether no member was skipped.
+        """
+
+        max_depth = self.max_depth if self.max_depth is not None else math.inf
+        # Each frame is [type name, elements iterator, layout, suffix in the parent type, complete layout flag]
+        stack = [[type_name, iter(self._usertype_defs[type_name]), [], '', True]]
+        active_types = {type_name}
+        while True:
+            frame = stack[-1]
+            element = next(frame[1], None)
+            if element is None:  # All the members of the type are flattened
+                stack.pop()
+                active_types.discard(frame[0])
+                # Layouts truncated by a skipped member depend on the parent types so they are not stored
+                if frame[4]:
+                    self.type_store.put(self._usertype_hashes[frame[0]], frame[2])
+                if not stack:
+                    return frame[2], frame[4]
+                stack[-1][2].extend((f'{frame[3]}{suffix}', comment, byteoffset)
+                                    for suffix, comment, byteoffset in frame[2])
+                continue
+
+            suffix = f".{element['iecname']}"
+            element_type = element['type']
+            # Add members of SimpleType. Testing on UserType definition make it to work as well for ArrayType
+            if element_type not in self._usertype_defs:
+                byteoffset = int(element['byteoffset']) if element['byteoffset'] is not None else None
+                frame[2].append((suffix, element['comment'], byteoffset))
+                continue
+
+            if element_type in active_types:
+                self._skip_type_member(stack, suffix, f'references {element_type} recursively')
+                continue
+
+            # A stored layout is complete, so it is only reused when the member type fits in the remaining depth.
+            # Otherwise, the member type is flattened again to be truncated at the same level whatever the store holds
+            layout = None
+            if len(stack) + self._usertype_depths[element_type] <= max_depth:
+                layout = self.type_store.get(self._usertype_hashes[element_type])
+            if layout is not None:
+                frame[2].extend((f'{suffix}{sub_suffix}', comment, byteoffset)
+                                for sub_suffix, comment, byteoffset in layout)
+            elif len(stack) >= max_depth:
+                self._skip_type_member(stack, suffix, f'exceeds the maximum depth of {self.max_depth}')
+            else:  # Add the sub-members on the next iterations
+                stack.append([element_type, iter(self._usertype_defs[element_type]), [], suffix, True])
+                active_types.add(element_type)
+
+    def _skip_type_member(self, stack, suffix, reason):
+        for frame in stack:
+            frame[4] = False
+        path = ''.join(parent_frame[3] for parent_frame in stack) + suffix
+        self.traversal_warnings.append(f'Member {stack[0][0]}{path} skipped: it {reason}.')
+
+    def _get_type_layout(self, type_name):
+        """
+        Get the flattened layout of a type definition from the type store, flattening it on a store miss.
+        :param type_name: Name of the type definition.
+        :return: A list of (path suffix, comment, byteoffset) tuples for the members of simple type.
+        """
+
+        if type_name in self._truncated_layouts:
+            return self._truncated_layouts[type_name]
+        layout = None
+        if self.max_depth is None or self._usertype_depths[type_name] <= self.max_depth:
+            layout = self.type_store.get(self._usertype_hashes[type_name])
+        if layout is None:
+            layout, complete = self._flatten_type(type_name)
+            if not complete:
+                self._truncated_layouts[type_name] = layout
+        return layout
+
     def _get_type_element_paths(self, type_name, parent_path):
         """
-        Recursive method to get each member of a specific type definition identified by its name.
+        Get each member of a specific type definition identified by its name.
         :param type_name: Name of the type definition.
         :param parent_path: parent path of the current node to concatenate with.
         :return: A list containing the symbol data for the specified type.
         """
 
-        paths = []
-        if type_name in self._usertype_defs:
-            for element in self._usertype_defs[type_name]:
-                current_path = f"{parent_path}.{element['iecname']}"
-
-                # Add members of SimpleType. Testing on UserType definition make it to work as well for ArrayType
-                if element['type'] not in self._usertype_defs:
-                    byteoffset = int(element['byteoffset']) if 'byteoffset' in element else None
-                    paths.append({
-                        'name': current_path,
-                        'comment': element['comment'],
-                        'byteoffset': byteoffset
-                    })
-                else:  # Recursive call to add the sub-members
-                    paths.extend(self._get_type_element_paths(element['type'], current_path))
-        return paths
+        if type_name not in self._usertype_defs:
+            return []
+        return [{
+            'name': f'{parent_path}{suffix}',
+            'comment': comment,
+            'byteoffset': byteoffset
+        } for suffix, comment, byteoffset in self._get_type_layout(type_name)]
 
     def _get_node_paths(self, node, current_path=""):
         """
-        Recursive method to traverse all Node elements (so-called symbols) and to return them as a list.
+        Traverse all Node elements (so-called symbols) below node using an explicit stack and return them as a list.
+        Nodes nested deeper than max_depth are skipped.
         :param node:
-        :param current_path: A string representing the current parent path of the symbol which is constructed recursively.
+        :param current_path: A string representing the parent path of node.
         :return: A list of symbols from Node elements.
         """
 
         paths = []
-        node_name = node.get('name')
-        node_type = node.get('type')
-        current_path = f"{current_path}.{node_name}" if current_path else node_name
-        child_nodes = node.findall('./ns:Node', namespaces=self.__namespace)
-
-        # Add the elements depending on the type of the current node (for example, the structure members)
-        paths.extend(self._get_type_element_paths(node_type, current_path))
-
-        # Add the current node to the symbols list only if it is the last node (no children) and is of simple type
-        if not child_nodes and node_type not in self._usertype_defs:
-            comment = node.find('ns:Comment', namespaces=self.__namespace)
-            # if comment is not None:
-            #     print(comment.text)
-            paths.append({
-                'name': current_path,
-                'comment': parse_comment(comment)
-            })
-        else:
-            for child in child_nodes:
-                paths.extend(self._get_node_paths(child, current_path))
+        # Names of the nodes from the root to the current node, only joined when a symbol path is needed
+        segments = [current_path] if current_path else []
+        # Each item is (node, depth, number of segments of its parent)
+        stack = [(node, 0, len(segments))]
+        while stack:
+            node, depth, parent_length = stack.pop()
+            node_name = node.get('name')
+            node_type = node.get('type')
+            del segments[parent_length:]
+            if node_name:
+                segments.append(node_name)
+            if self.max_depth is not None and depth > self.max_depth:
+                self.traversal_warnings.append(
+                    f"Node {'.'.join(segments)} skipped: it exceeds the maximum depth of {self.max_depth}.")
+                continue
+            child_nodes = node.findall(self.__node_tag)
+
+            # Add the elements depending on the type of the current node (for example, the structure members)
+            if node_type in self._usertype_defs:
+                paths.extend(self._get_type_element_paths(node_type, '.'.join(segments)))
+
+            # Add the current node to the symbols list only if it is the last node (no children) and is of simple type
+            if not child_nodes and node_type not in self._usertype_defs:
+                comment = node.find(self.__comment_tag)
+                paths.append({
+                    'name': '.'.join(segments) if segments else node_name,
+                    'comment': parse_comment(comment)
+                })
+            else:
+                # Pushed in reverse order so that the children are popped in document order
+                segments_length = len(segments)
+                stack.extend((child, depth + 1, segments_length) for child in reversed(child_nodes))
 
         return paths
 
@@ -171,6 +311,9 @@ if __name__ == '__main__':
     symbols = parser.get_symbols()
 
     print(f'{len(symbols)} symbols found.')
+    print(f'Type store: {parser.type_store.stats()}')
+    for warning in parser.traversal_warnings:
+        print(warning)
 
     output_filepath = Path(symbols_filepath).with_suffix('.csv')
     fieldnames = ['name', 'comment']
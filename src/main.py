@@ -1,10 +1,17 @@
-import csv
 from pathlib import Path
 from tkinter.filedialog import askopenfilename, asksaveasfilename
 from tkinter import messagebox
 
 from codesys_symbols_parser import CodesysSymbolParser
-from xls_write import write_xls
+from symbol_sinks import CsvSink, write_symbols
+from type_store import TypeStore
+from xls_write import HmiAlarmSink
+
+# Maximum number of traversal warnings listed in the result message
+MAX_SHOWN_WARNINGS = 10
+
+# Type store shared by the symbols files of the same directory to reuse the flattened types across runs
+TYPE_STORE_FILENAME = 'codesys_types.json'
 
 
 def ask_for_overwrite(filepath):
@@ -21,6 +28,16 @@ def ask_for_overwrite(filepath):
     return filepath
 
 
+def format_warnings(warnings):
+    """Format the traversal warnings for the result message"""
+    if not warnings:
+        return ''
+    lines = [f'\n{len(warnings)} warnings:'] + warnings[:MAX_SHOWN_WARNINGS]
+    if len(warnings) > MAX_SHOWN_WARNINGS:
+        lines.append(f'... and {len(warnings) - MAX_SHOWN_WARNINGS} more.')
+    return '\n'.join(lines)
+
+
 def main():
     symbols_filepath = askopenfilename(title='Please choose a CoDeSys application symbols file to open',
                                        filetypes=[('XML files', '.xml'), ('All files', '.*')])
@@ -29,28 +46,32 @@ def main():
                              "No file selected.")
         return -1
 
-    parser = CodesysSymbolParser(symbols_filepath)
+    type_store_filepath = Path(symbols_filepath).with_name(TYPE_STORE_FILENAME)
+    parser = CodesysSymbolParser(symbols_filepath, TypeStore.load(type_store_filepath))
     parser.parse()
     symbols = parser.get_symbols()
+    try:
+        parser.type_store.save(type_store_filepath)
+    except OSError:
+        pass  # The type store is only a cache, failing to save it must not prevent saving the symbols
     csv_out_filepath = ask_for_overwrite(Path(symbols_filepath).with_suffix('.csv'))
     if not csv_out_filepath:
         messagebox.showerror("No output file selected",
                              "No file selected to save the results.")
         return -1
 
-    fieldnames = ['name', 'comment']
-    with open(csv_out_filepath, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writerows(symbols)
-
     xlsx_out_filepath = ask_for_overwrite(Path(symbols_filepath).with_suffix('.xlsx'))
-    write_xls(xlsx_out_filepath, symbols)
+
+    # Write all the output files in a single pass over the symbols
+    write_symbols(symbols, [CsvSink(csv_out_filepath), HmiAlarmSink(xlsx_out_filepath)])
 
     messagebox.showinfo("Symbols saved",
                         f'{len(symbols)} symbols found.\n'
+                        f'Type store: {parser.type_store.stats()}\n'
                         f'File saved to :\n'
                         f'{csv_out_filepath}\n'
-                        f'{xlsx_out_filepath}')
+                        f'{xlsx_out_filepath}'
+                        f'{format_warnings(parser.traversal_warnings)}')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,129 @@
+import csv
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+@dataclass
+class SymbolCategory:
+    member: str  # Name of the station structure member holding the symbol
+    category_id: int  # Category used in the HMI alarm sheet
+    alarm_offset: Optional[int] = None  # Base ID of the station alarms, None if not a station alarm
+
+
+symbol_categories = [
+    SymbolCategory('stDefImdt', 0, 1),  # Défauts immédiats
+    SymbolCategory('stDefFcy', 1, 1000),  # Défauts fin de cycle
+    SymbolCategory('stDefAttente', 2, 2000),  # Arrêts attente
+    SymbolCategory('stHmiAvert', 3),  # Avertissements
+    SymbolCategory('stHmiMessage', 4)  # Messages
+]
+
+_categories_by_member = {category.member: category for category in symbol_categories}
+_category_pattern = re.compile(
+    r'Application\.(\w+)\.(' + '|'.join(category.member for category in symbol_categories) + r')\.')
+_station_pattern = re.compile(r'S(\d+)')
+
+
+@dataclass
+class SymbolClass:
+    category: SymbolCategory
+    station_id: Optional[str] = None  # Station number if the symbol belongs to a station (S<number>)
+
+
+def classify_symbol(symbol):
+    """
+    Find the category of a symbol from its path.
+    :param symbol: A symbol dictionary as returned by CodesysSymbolParser.get_symbols().
+    :return: A SymbolClass instance or None if the symbol does not belong to any category.
+    """
+    res = _category_pattern.search(symbol['name'])
+    if not res:
+        return None
+    station = _station_pattern.fullmatch(res.group(1))
+    return SymbolClass(_categories_by_member[res.group(2)], station.group(1) if station else None)
+
+
+class SymbolSink(ABC):
+    """
+    Base class of the outputs fed by write_symbols().
+    Each symbol is passed to write() along with its classification, which is None for unclassified symbols.
+    close() finalizes the output once all the symbols are written, abort() discards it if the pass failed.
+    """
+
+    def open(self):
+        pass
+
+    @abstractmethod
+    def write(self, symbol, symbol_class):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class CsvSink(SymbolSink):
+    fieldnames = ['name', 'comment']
+
+    def __init__(self, fname):
+        self.fname = fname
+
+        self._file = None
+        self._writer = None
+
+    def open(self):
+        self._file = open(self.fname, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+
+    def write(self, symbol, symbol_class):
+        self._writer.writerow(symbol)
+
+    def close(self):
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        Path(self.fname).unlink(missing_ok=True)
+
+
+def abort_sinks(sinks):
+    """Abort each sink, ignoring their errors so that the error which made the pass fail is the one raised"""
+    for sink in sinks:
+        try:
+            sink.abort()
+        except Exception:
+            pass
+
+
+def write_symbols(symbols, sinks):
+    """
+    Classify each symbol once and dispatch it to every sink in a single pass over the symbols.
+    If the pass fails, the opened sinks are aborted so that no truncated output is left. If a sink fails to close,
+    it is aborted along with the sinks not closed yet and its error is raised.
+    :param symbols: An iterable of symbol dictionaries.
+    :param sinks: A list of SymbolSink instances.
+    """
+    opened = []
+    try:
+        for sink in sinks:
+            sink.open()
+            opened.append(sink)
+        for symbol in symbols:
+            symbol_class = classify_symbol(symbol)
+            for sink in sinks:
+                sink.write(symbol, symbol_class)
+    except BaseException:
+        abort_sinks(opened)
+        raise
+
+    for i, sink in enumerate(opened):
+        try:
+            sink.close()
+        except BaseException:
+            abort_sinks(opened[i:])
+            raise
@@ -0,0 +1,79 @@
+import hashlib
+import json
+
+# Bump when the layout format changes so that stores saved by older versions are ignored
+STORE_VERSION = 1
+
+
+def hash_type_def(elements, element_hashes):
+    """
+    Compute the structural hash of a user type definition.
+    :param elements: The elements of the type definition as returned by CodesysSymbolParser._extract_usertype_defs().
+    :param element_hashes: The structural hash of each element type, None for the types which are not user types.
+    :return: A hexadecimal digest string.
+    """
+    structure = tuple((element['iecname'], element['type'], element['comment'], element['byteoffset'], element_hash)
+                      for element, element_hash in zip(elements, element_hashes))
+    return hashlib.sha1(repr(structure).encode('utf-8')).hexdigest()
+
+
+class TypeStore:
+    """
+    Flattened user type layouts indexed on the structural hash of their type definition.
+    A store can be shared by several parsers to reuse the layouts of the types found in several Applications,
+    and can be saved to a file to be reused across runs.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+        self._layouts = {}
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def get(self, type_hash):
+        """
+        :param type_hash: Structural hash of the type definition.
+        :return: The flattened layout of the type or None if it is not stored yet.
+        """
+        layout = self._layouts.get(type_hash)
+        if layout is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return layout
+
+    def put(self, type_hash, layout):
+        self._layouts[type_hash] = layout
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return (f'{len(self)} types stored, {self.hits} hits, {self.misses} misses '
+                f'({self.hit_rate:.1%} hit rate)')
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STORE_VERSION, 'layouts': self._layouts}, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a store saved with save(). An empty store is returned if the file does not exist, is invalid or outdated.
+        """
+        store = cls()
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == STORE_VERSION:
+                store._layouts = {type_hash: [(suffix, comment, byteoffset) for suffix, comment, byteoffset in layout]
+                                  for type_hash, layout in data['layouts'].items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            # The store is only a cache, the layouts are flattened again when it cannot be read
+            pass
+        return store
@@ -1,6 +1,7 @@
-import re
 import xlsxwriter
 
+from symbol_sinks import SymbolSink, write_symbols
+
 
 def write_headers(worksheet):
     worksheet.write('A1', 'VERSION')
@@ -390,32 +391,39 @@ def get_row_data(category_id, symbol):
         "null"                  # Index (Activer/Désactiver)
     ]
 
-def write_rows(worksheet, symbols):
-    row_id = 2  # Starts writing at row 3
+class HmiAlarmSink(SymbolSink):
+    def __init__(self, fname):
+        self.fname = fname
+
+        self._workbook = None
+        self._worksheet = None
+        self._row_id = 2
+
+    def open(self):
+        self._workbook = xlsxwriter.Workbook(self.fname)
+        self._worksheet = self._workbook.add_worksheet()
+        write_headers(self._worksheet)
+        self._row_id = 2  # Starts writing at row 3
+
+    def write(self, symbol, symbol_class):
+        if symbol_class is None:
+            return
+        row_data = get_row_data(symbol_class.category.category_id, symbol)
+        for i, value in enumerate(row_data):
+            self._worksheet.write(self._row_id, i, value)
+        self._row_id += 1
+
+    def close(self):
+        self._workbook.close()
 
-    for symbol in symbols:
-        row_data = None
-        if re.search(r'Application\.\w+\.stDefImdt\.', symbol['name']):  # Défauts immédiats
-            row_data = get_row_data(0, symbol)
-        elif re.search(r'Application\.\w+\.stDefFcy\.', symbol['name']):  # Défauts fin de cycle
-            row_data = get_row_data(1, symbol)
-        elif re.search(r'Application\.\w+\.stDefAttente\.', symbol['name']):  # Arrêts attente
-            row_data = get_row_data(2, symbol)
-        elif re.search(r'Application\.\w+\.stHmiAvert\.', symbol['name']):  # Avertissements
-            row_data = get_row_data(3, symbol)
-        elif re.search(r'Application\.\w+\.stHmiMessage\.', symbol['name']):  # Messages
-            row_data = get_row_data(4, symbol)
+    def abort(self):
+        # The workbook is only written to disk when closed, dropping it discards the output
+        self._workbook = None
+        self._worksheet = None
 
-        if row_data is not None:
-            for i, value in enumerate(row_data):
-                worksheet.write(row_id, i, value)
-            row_id += 1
 
 def write_xls(fname, symbols):
-    with xlsxwriter.Workbook(fname) as workbook:
-        worksheet = workbook.add_worksheet()
-        write_headers(worksheet)
-        write_rows(worksheet, symbols)
+    write_symbols(symbols, [HmiAlarmSink(fname)])
 
 
 if __name__ == '__main__':
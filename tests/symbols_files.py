@@ -0,0 +1,29 @@
+from codesys_symbols_parser import CodesysSymbolParser
+
+NAMESPACE = 'http://www.3s-software.com/schemas/Symbolconfiguration.xsd'
+
+
+def type_def(name, elements):
+    members = ''.join(f'<UserDefElement iecname="{iecname}" type="{type_name}" byteoffset="{offset}"/>'
+                      for offset, (iecname, type_name) in enumerate(elements))
+    return f'<TypeUserDef name="{name}" typeclass="Userdef">{members}</TypeUserDef>'
+
+
+def write_symbols_file(path, type_defs, nodes):
+    path.write_text(f'<Symbolconfiguration xmlns="{NAMESPACE}"><TypeList>{"".join(type_defs)}</TypeList>'
+                    f'<NodeList><Node name="Application">{nodes}</Node></NodeList></Symbolconfiguration>',
+                    encoding='utf-8')
+    return path
+
+
+def get_symbols(path, **kwargs):
+    parser = CodesysSymbolParser(path, **kwargs)
+    parser.parse()
+    return parser, parser.get_symbols()
+
+
+NESTED_TYPES = [
+    type_def('R', [('x', 'X')]),
+    type_def('X', [('y', 'Y')]),
+    type_def('Y', [('a', 'BOOL'), ('b', 'BOOL')]),
+]
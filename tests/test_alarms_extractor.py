@@ -0,0 +1,104 @@
+import tracemalloc
+
+import pytest
+
+from alarms_extractor import MAX_MERGE_RUNS, AlarmAggregator, add_alarm
+from symbol_sinks import classify_symbol
+
+
+def alarm(station_id, alarm_id, index):
+    return station_id, alarm_id, {'name': f'Application.S{station_id}.stDefImdt.x{index}', 'comment': f'alarm {index}'}
+
+
+def iter_alarms(count):
+    """Alarms spread over stations "01", "1" and "2", with an ID shared by each group of three alarms"""
+    return (alarm(['2', '1', '01'][i % 3], 1000 - i // 3, i) for i in range(count))
+
+
+def make_alarms(count):
+    return list(iter_alarms(count))
+
+
+def fill(aggregator, alarms):
+    for station_id, alarm_id, symbol in alarms:
+        aggregator.add(station_id, alarm_id, symbol)
+    return aggregator
+
+
+def expected_rows(alarms):
+    # A stable sort keeps the symbols order of the alarms sharing an ID
+    ordered = sorted(alarms, key=lambda item: (int(item[0]), item[0], item[1]))
+    return [(station_id, alarm_id, symbol['name'], symbol['comment']) for station_id, alarm_id, symbol in ordered]
+
+
+@pytest.mark.parametrize('memory_budget', [1, 7, 1000000])
+def test_rows_are_sorted_with_multi_level_merges(memory_budget):
+    alarms = make_alarms(MAX_MERGE_RUNS ** 2 * 2 + 5)
+    aggregator = fill(AlarmAggregator(memory_budget), alarms)
+    try:
+        if memory_budget == 1:
+            # Level 2 runs are made of level 1 runs merged earlier
+            assert max(level for level, _ in aggregator._runs) == 2
+        assert list(aggregator.rows()) == expected_rows(alarms)
+        assert aggregator.alarm_count == len(alarms)
+        assert aggregator.station_ids == {'01', '1', '2'}
+    finally:
+        aggregator.close()
+
+
+def test_collisions_are_reported_per_station():
+    alarms = [alarm('1', 5, 0), alarm('01', 5, 1), alarm('1', 5, 2), alarm('1', 6, 3), alarm('01', 7, 4),
+              alarm('01', 7, 5)]
+    aggregator = fill(AlarmAggregator(memory_budget=1), alarms)
+    reported = []
+    try:
+        collisions = aggregator.validate(on_collision=lambda *collision: reported.append(collision))
+    finally:
+        aggregator.close()
+
+    expected = [('01', 7, ['Application.S01.stDefImdt.x4', 'Application.S01.stDefImdt.x5']),
+                ('1', 5, ['Application.S1.stDefImdt.x0', 'Application.S1.stDefImdt.x2'])]
+    assert collisions == aggregator.collisions == reported == expected
+
+
+def test_close_releases_run_files():
+    aggregator = fill(AlarmAggregator(memory_budget=1), make_alarms(MAX_MERGE_RUNS * 3))
+    runs = [run for _, run in aggregator._runs]
+    assert runs
+
+    aggregator.close()
+
+    assert all(run.closed for run in runs)
+    assert aggregator._runs == []
+
+
+def peak_memory(count):
+    aggregator = AlarmAggregator(memory_budget=500)
+    tracemalloc.start()
+    try:
+        fill(aggregator, iter_alarms(count))
+        for _ in aggregator.rows():
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        aggregator.close()
+
+
+def test_peak_memory_does_not_grow_with_alarm_count():
+    assert peak_memory(40000) < 2 * peak_memory(10000)
+
+
+def test_alarms_without_byteoffset_are_skipped():
+    aggregator = AlarmAggregator()
+    symbols = [{'name': 'Application.S1.stDefImdt.xNode', 'comment': ''},
+               {'name': 'Application.S1.stDefImdt.xNone', 'comment': '', 'byteoffset': None},
+               {'name': 'Application.S1.stDefImdt.xAlarm', 'comment': 'alarm', 'byteoffset': 3}]
+    try:
+        for symbol in symbols:
+            add_alarm(aggregator, symbol, classify_symbol(symbol))
+        assert list(aggregator.rows()) == [('1', 4, 'Application.S1.stDefImdt.xAlarm', 'alarm')]
+    finally:
+        aggregator.close()
+
+    assert aggregator.skipped_symbols == ['Application.S1.stDefImdt.xNode', 'Application.S1.stDefImdt.xNone']
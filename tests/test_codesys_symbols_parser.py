@@ -0,0 +1,55 @@
+import pytest
+
+from symbols_files import NESTED_TYPES, get_symbols, type_def, write_symbols_file
+from type_store import TypeStore
+
+
+@pytest.mark.parametrize('type_store', [None, TypeStore()])
+def test_depth_limit_does_not_depend_on_node_order(tmp_path, type_store):
+    x_first = write_symbols_file(tmp_path / 'x_first.xml', NESTED_TYPES,
+                                 '<Node name="nX" type="X"/><Node name="nR" type="R"/>')
+    r_first = write_symbols_file(tmp_path / 'r_first.xml', NESTED_TYPES,
+                                 '<Node name="nR" type="R"/><Node name="nX" type="X"/>')
+
+    parser_x, symbols_x = get_symbols(x_first, max_depth=2, type_store=type_store)
+    parser_r, symbols_r = get_symbols(r_first, max_depth=2, type_store=type_store)
+
+    assert sorted(symbols_x, key=lambda symbol: symbol['name']) == sorted(symbols_r, key=lambda symbol: symbol['name'])
+    assert [symbol['name'] for symbol in symbols_x] == ['Application.nX.y.a', 'Application.nX.y.b']
+    assert parser_x.traversal_warnings == parser_r.traversal_warnings == ['Member R.x.y skipped: '
+                                                                          'it exceeds the maximum depth of 2.']
+
+
+def test_deep_nodes_are_kept_by_default(tmp_path):
+    depth = 2000
+    path = write_symbols_file(tmp_path / 'deep.xml', [],
+                              '<Node name="n">' * depth + '<Node name="leaf" type="BOOL"/>' + '</Node>' * depth)
+
+    parser, symbols = get_symbols(path)
+
+    assert [symbol['name'] for symbol in symbols] == ['Application' + '.n' * depth + '.leaf']
+    assert parser.traversal_warnings == []
+
+
+def test_self_referencing_types_are_skipped(tmp_path):
+    type_defs = [
+        type_def('A', [('v', 'BOOL'), ('a', 'A')]),
+        type_def('B', [('v', 'BOOL'), ('c', 'C')]),
+        type_def('C', [('w', 'BOOL'), ('b', 'B')]),
+    ]
+    path = write_symbols_file(tmp_path / 'cycles.xml', type_defs, '<Node name="nA" type="A"/><Node name="nB" type="B"/>')
+
+    parser, symbols = get_symbols(path)
+
+    assert [symbol['name'] for symbol in symbols] == ['Application.nA.v', 'Application.nB.v', 'Application.nB.c.w']
+    assert parser.traversal_warnings == ['Member A.a skipped: it references A recursively.',
+                                         'Member B.c.b skipped: it references B recursively.']
+
+
+def test_members_without_byteoffset(tmp_path):
+    type_defs = ['<TypeUserDef name="T" typeclass="Userdef"><UserDefElement iecname="v" type="BOOL"/></TypeUserDef>']
+    path = write_symbols_file(tmp_path / 'no_offset.xml', type_defs, '<Node name="nT" type="T"/>')
+
+    _, symbols = get_symbols(path)
+
+    assert symbols == [{'name': 'Application.nT.v', 'comment': '', 'byteoffset': None}]
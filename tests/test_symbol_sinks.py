@@ -0,0 +1,79 @@
+import pytest
+
+from alarms_extractor import AlarmIdSink
+from symbol_sinks import CsvSink, SymbolSink, classify_symbol, write_symbols
+from xls_write import HmiAlarmSink
+
+
+@pytest.mark.parametrize('member, category_id, alarm_offset', [
+    ('stDefImdt', 0, 1),
+    ('stDefFcy', 1, 1000),
+    ('stDefAttente', 2, 2000),
+    ('stHmiAvert', 3, None),
+    ('stHmiMessage', 4, None),
+])
+def test_classify_symbol_categories(member, category_id, alarm_offset):
+    station_class = classify_symbol({'name': f'Application.S12.{member}.xAlarm'})
+    other_class = classify_symbol({'name': f'Application.GVL.{member}.xAlarm'})
+
+    assert station_class.category.category_id == other_class.category.category_id == category_id
+    assert station_class.category.alarm_offset == other_class.category.alarm_offset == alarm_offset
+    assert station_class.station_id == '12'
+    assert other_class.station_id is None
+
+
+@pytest.mark.parametrize('name', [
+    'Application.S1.xValue',
+    'Application.S1.stDefImdt',
+    'Application.S1.sub.stDefImdtX.xAlarm',
+])
+def test_classify_symbol_unclassified(name):
+    assert classify_symbol({'name': name}) is None
+
+
+def alarm_symbols():
+    return [{'name': f'Application.S1.stDefImdt.x{i}', 'comment': f'alarm {i}', 'byteoffset': i} for i in range(3)]
+
+
+class FailingWriteSink(SymbolSink):
+    def write(self, symbol, symbol_class):
+        raise RuntimeError('write failed')
+
+
+class FailingCloseSink(SymbolSink):
+    def write(self, symbol, symbol_class):
+        pass
+
+    def close(self):
+        raise RuntimeError('close failed')
+
+
+def output_sinks(tmp_path):
+    return [CsvSink(tmp_path / 'symbols.csv'),
+            HmiAlarmSink(tmp_path / 'hmi.xlsx'),
+            AlarmIdSink(tmp_path / 'alarms.xlsx', memory_budget=1)]
+
+
+def test_write_symbols_writes_every_sink(tmp_path):
+    write_symbols(alarm_symbols(), output_sinks(tmp_path))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['alarms.xlsx', 'hmi.xlsx', 'symbols.csv']
+
+
+def test_failing_write_leaves_no_output(tmp_path):
+    with pytest.raises(RuntimeError, match='write failed'):
+        write_symbols(alarm_symbols(), output_sinks(tmp_path) + [FailingWriteSink()])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failing_close_aborts_remaining_sinks(tmp_path):
+    csv_sink, hmi_sink, alarm_sink = output_sinks(tmp_path)
+
+    with pytest.raises(RuntimeError, match='close failed'):
+        write_symbols(alarm_symbols(), [hmi_sink, FailingCloseSink(), csv_sink, alarm_sink])
+
+    # Sinks closed before the failure are complete, the following ones are discarded
+    assert [path.name for path in tmp_path.iterdir()] == ['hmi.xlsx']
+    assert csv_sink._file.closed
+    assert alarm_sink._aggregator._runs == []
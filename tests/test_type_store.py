@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from symbols_files import NESTED_TYPES, get_symbols, write_symbols_file
+from type_store import STORE_VERSION, TypeStore
+
+
+def test_shared_type_store_reuses_layouts(tmp_path):
+    path = write_symbols_file(tmp_path / 'app.xml', NESTED_TYPES, '<Node name="nR" type="R"/>')
+    type_store = TypeStore()
+
+    _, first = get_symbols(path, type_store=type_store)
+    misses = type_store.misses
+    _, second = get_symbols(path, type_store=type_store)
+
+    assert first == second
+    assert [symbol['name'] for symbol in first] == ['Application.nR.x.y.a', 'Application.nR.x.y.b']
+    assert type_store.misses == misses
+    assert type_store.hits > 0
+
+
+def test_type_store_save_and_load(tmp_path):
+    path = write_symbols_file(tmp_path / 'app.xml', NESTED_TYPES, '<Node name="nR" type="R"/>')
+    type_store = TypeStore()
+    _, symbols = get_symbols(path, type_store=type_store)
+    type_store.save(tmp_path / 'types.json')
+
+    loaded = TypeStore.load(tmp_path / 'types.json')
+    _, reloaded_symbols = get_symbols(path, type_store=loaded)
+
+    assert reloaded_symbols == symbols
+    assert loaded.misses == 0
+
+
+def test_type_store_load_missing_file(tmp_path):
+    assert len(TypeStore.load(tmp_path / 'codesys_types.json')) == 0
+
+
+@pytest.mark.parametrize('content', [
+    'not json',
+    '[1, 2]',
+    json.dumps({'version': STORE_VERSION - 1, 'layouts': {'hash': [['.a', '', 0]]}}),
+    json.dumps({'version': STORE_VERSION, 'layouts': {'hash': [['.a', '']]}}),
+    json.dumps({'version': STORE_VERSION, 'layouts': [1]}),
+])
+def test_type_store_load_invalid_file(tmp_path, content):
+    path = tmp_path / 'codesys_types.json'
+    path.write_text(content, encoding='utf-8')
+
+    type_store = TypeStore.load(path)
+
+    assert len(type_store) == 0
+    # The types are flattened again from an invalid store
+    _, symbols = get_symbols(write_symbols_file(tmp_path / 'app.xml', NESTED_TYPES, '<Node name="nR" type="R"/>'),
+                             type_store=type_store)
+    assert [symbol['name'] for symbol in symbols] == ['Application.nR.x.y.a', 'Application.nR.x.y.b']